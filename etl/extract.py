@@ -1,51 +1,141 @@
+import ijson
+import numpy as np
+import orjson
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Shared HTTP session for all USGS calls. Pooled connections are reused
+# across fetchers and flow runs (no per-call TCP/TLS handshake), with
+# automatic retry/backoff on transient server errors.
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3,
+                      backoff_factor=0.3,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+))
+SESSION.headers.update({
+    'Accept-Encoding': 'gzip,deflate',
+    'User-Agent': 'EarthQuakeOverview/1.0',
+})
+
+# Event properties kept from the USGS feed, in output order.
+PROPERTY_COLUMNS = [
+    "place", "mag", "time", "updated", "tz",
+    "felt", "cdi", "mmi", "alert", "status",
+    "tsunami", "sig", "net", "code", "ids",
+    "sources", "types",
+]
+
+OUTPUT_COLUMNS = (
+    ["id"] + PROPERTY_COLUMNS + ["longitude", "latitude", "depth", "fetched_at"]
+)
+
+def _assemble_dataframe(columns: dict, longitude: list, latitude: list, depth: list) -> pd.DataFrame:
+    """
+    Build the event DataFrame from per-column lists.
+
+    Each column is converted in one pass: coordinates to float64 arrays,
+    epoch-ms timestamps through a single vectorized pd.to_datetime, and
+    fetched_at as one tz-aware timestamp broadcast to every row.
+
+    Parameters:
+        columns (dict): Column name to list of scalars for id/properties.
+        longitude (list): Longitudes per event.
+        latitude (list): Latitudes per event.
+        depth (list): Depths per event.
+
+    Returns:
+        pd.DataFrame: Flattened earthquake event data with relevant fields.
+    """
+    df = pd.DataFrame(columns)
+    df['longitude'] = np.asarray(longitude, dtype=np.float64)
+    df['latitude'] = np.asarray(latitude, dtype=np.float64)
+    df['depth'] = np.asarray(depth, dtype=np.float64)
+    df['time'] = pd.to_datetime(df['time'], unit='ms', utc=True)
+    df['updated'] = pd.to_datetime(df['updated'], unit='ms', utc=True)
+    df['fetched_at'] = pd.Timestamp.now(tz='UTC')
+
+    return df.reindex(columns=OUTPUT_COLUMNS)
+
 
 def parse_geojson(data: dict) -> pd.DataFrame:
     """
     Parse a GeoJSON response from USGS API into a pandas DataFrame.
 
+    Scalars go straight from each feature into per-column lists pre-sized
+    to the feature count — no per-row dicts, no re-bucketing of records
+    by pandas — and every column is then converted in a single pass.
+
     Parameters:
         data (dict): JSON object returned by USGS GeoJSON API.
 
     Returns:
         pd.DataFrame: Flattened earthquake event data with relevant fields.
     """
-    records = []
+    features = data['features']
+    n = len(features)
+    if n == 0:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    columns = {name: [None] * n for name in ["id"] + PROPERTY_COLUMNS}
+    longitude = [0.0] * n
+    latitude = [0.0] * n
+    depth = [0.0] * n
 
-    for feature in data['features']:
+    for i, feature in enumerate(features):
         props = feature['properties']
+        columns['id'][i] = feature.get('id')
+        for name in PROPERTY_COLUMNS:
+            columns[name][i] = props.get(name)
         coords = feature['geometry']['coordinates']  # [lon, lat, depth]
+        longitude[i] = coords[0]
+        latitude[i] = coords[1]
+        depth[i] = coords[2]
 
-        record = {
-            "id": feature.get("id"),
-            "place": props.get("place"),
-            "mag": props.get("mag"),
-            "time": pd.to_datetime(props.get("time"), unit='ms'),
-            "updated": pd.to_datetime(props.get("updated"), unit='ms'),
-            "tz": props.get("tz"),
-            "felt": props.get("felt"),
-            "cdi": props.get("cdi"),
-            "mmi": props.get("mmi"),
-            "alert": props.get("alert"),
-            "status": props.get("status"),
-            "tsunami": props.get("tsunami"),
-            "sig": props.get("sig"),
-            "net": props.get("net"),
-            "code": props.get("code"),
-            "ids": props.get("ids"),
-            "sources": props.get("sources"),
-            "types": props.get("types"),
-            "longitude": coords[0],
-            "latitude": coords[1],
-            "depth": coords[2],
-            "fetched_at": datetime.now(timezone.utc)
-        }
-        records.append(record)
-
-    return pd.DataFrame(records)
+    return _assemble_dataframe(columns, longitude, latitude, depth)
+
+
+def parse_geojson_stream(features) -> pd.DataFrame:
+    """
+    Build the event DataFrame from a streamed iterable of GeoJSON features.
+
+    Unlike parse_geojson, this never materializes the full payload dict:
+    features are consumed one at a time and their scalars appended to
+    per-column lists, so peak memory is one feature plus the columnar
+    output instead of the whole multi-MB feed.
+
+    Parameters:
+        features (iterable): GeoJSON feature dicts, e.g. from ijson.items.
+
+    Returns:
+        pd.DataFrame: Flattened earthquake event data with relevant fields.
+    """
+    columns = {name: [] for name in ["id"] + PROPERTY_COLUMNS}
+    longitude, latitude, depth = [], [], []
+
+    for feature in features:
+        props = feature['properties']
+        columns['id'].append(feature.get('id'))
+        for name in PROPERTY_COLUMNS:
+            columns[name].append(props.get(name))
+        coords = feature['geometry']['coordinates']  # [lon, lat, depth]
+        longitude.append(coords[0])
+        latitude.append(coords[1])
+        depth.append(coords[2])
+
+    if not columns['id']:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    return _assemble_dataframe(columns, longitude, latitude, depth)
 
 
 def fetch_earthquake_all_day() -> pd.DataFrame:
@@ -57,10 +147,13 @@ def fetch_earthquake_all_day() -> pd.DataFrame:
     """
     url = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_day.geojson"
     try:
-        response = requests.get(url)
+        response = SESSION.get(url, stream=True, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
+        response.raw.decode_content = True
         logging.info("Fetched all_day data successfully.")
-        return parse_geojson(response.json())
+        return parse_geojson_stream(
+            ijson.items(response.raw, 'features.item', use_float=True)
+        )
     except Exception as e:
         logging.error(f"Error fetching all_day data: {e}")
         return pd.DataFrame()
@@ -74,10 +167,10 @@ def fetch_earthquake_past_hour() -> pd.DataFrame:
     """
     url = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_hour.geojson"
     try:
-        response = requests.get(url)
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         logging.info("Fetched all_hour data successfully.")
-        return parse_geojson(response.json())
+        return parse_geojson(orjson.loads(response.content))
     except Exception as e:
         logging.error(f"Error fetching all_hour data: {e}")
         return pd.DataFrame()
@@ -106,14 +199,64 @@ def fetch_earthquake_historical_daily(start_date: str, end_date: str, min_magnit
     }
 
     try:
-        response = requests.get(url, params=params)
+        response = SESSION.get(url, params=params, stream=True, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
+        response.raw.decode_content = True
         logging.info(f"Fetched historical daily data from {start_date} to {end_date}.")
-        return parse_geojson(response.json())
+        return parse_geojson_stream(
+            ijson.items(response.raw, 'features.item', use_float=True)
+        )
     except Exception as e:
         logging.error(f"Error fetching historical daily data: {e}")
         return pd.DataFrame()
-    
+
+def fetch_earthquake_historical_daily_parallel(
+    start_date: str,
+    end_date: str,
+    min_magnitude: float = 0.0,
+    chunk_days: int = 7,
+    max_workers: int = 8
+) -> pd.DataFrame:
+    """
+    Fetch a long historical range as concurrent sub-window requests.
+
+    The [start_date, end_date] range is split into chunk_days windows that
+    are fetched in parallel worker threads. The workers share the pooled
+    SESSION, so connections are reused and total latency approaches the
+    slowest window instead of the sum of all windows.
+
+    Parameters:
+        start_date (str): Start date in YYYY-MM-DD format.
+        end_date (str): End date in YYYY-MM-DD format.
+        min_magnitude (float): Minimum magnitude filter (default 0.0).
+        chunk_days (int): Length of each sub-window in days (default 7).
+        max_workers (int): Number of concurrent fetch threads (default 8).
+
+    Returns:
+        pd.DataFrame: Earthquake data from the full date range.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    windows = []
+    cursor = start
+    while cursor < end:
+        window_end = min(cursor + timedelta(days=chunk_days), end)
+        windows.append((cursor.isoformat(), window_end.isoformat()))
+        cursor = window_end
+
+    if not windows:
+        return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(
+            lambda window: fetch_earthquake_historical_daily(window[0], window[1], min_magnitude),
+            windows
+        ))
+
+    return pd.concat(frames, ignore_index=True)
+
+
 def fetch_earthquake_historical_hour(start_dt: datetime, end_dt: datetime, min_magnitude: float = 0.0) -> pd.DataFrame:
     """
     Fetch historical earthquake data by hourly range using USGS query API.
@@ -137,10 +280,10 @@ def fetch_earthquake_historical_hour(start_dt: datetime, end_dt: datetime, min_m
     }
 
     try:
-        response = requests.get(url, params=params)
+        response = SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         logging.info(f"Fetched historical hourly data from {start_dt} to {end_dt}.")
-        return parse_geojson(response.json())
+        return parse_geojson(orjson.loads(response.content))
     except Exception as e:
         logging.error(f"Error fetching historical hourly data: {e}")
         return pd.DataFrame()
\ No newline at end of file
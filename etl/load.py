@@ -8,14 +8,18 @@ Created: 2025-07-06
 
 Dependencies:
 - pandas
-- pandas-gbq
+- google-cloud-bigquery
+- google-cloud-bigquery-storage
 - pyarrow
 - google-auth
 """
 
 import os
 import pandas as pd
-from pandas_gbq import to_gbq
+import pyarrow as pa
+from google.cloud import bigquery
+from google.cloud import bigquery_storage_v1
+from google.cloud.bigquery_storage_v1 import types as storage_types
 from google.oauth2 import service_account
 import logging
 
@@ -23,6 +27,127 @@ from prefect_gcp import GcpCredentials
 
 logging.basicConfig(level=logging.INFO)
 
+# Map the pandas-gbq style if_exists modes onto BigQuery load job dispositions.
+WRITE_DISPOSITIONS = {
+    "replace": bigquery.WriteDisposition.WRITE_TRUNCATE,
+    "append": bigquery.WriteDisposition.WRITE_APPEND,
+    "fail": bigquery.WriteDisposition.WRITE_EMPTY,
+}
+
+_credentials = None
+
+def _get_credentials():
+    """
+    Load the service account credentials once and reuse them afterwards.
+
+    GcpCredentials.load hits the Prefect block store on every call;
+    caching the resolved credentials avoids that round-trip on repeated
+    uploads within a process.
+
+    Returns:
+        google.auth.credentials.Credentials: Cached credentials object.
+    """
+    global _credentials
+    if _credentials is None:
+        _credentials = GcpCredentials.load("gcp-credentials").get_credentials_from_service_account()
+    return _credentials
+
+def fetch_existing_ids(table_id: str, project_id: str) -> set:
+    """
+    Fetch event IDs recently loaded into the destination table.
+
+    Used by append-mode runs to skip re-enriching events that earlier
+    runs already geocoded and uploaded; only IDs fetched within the last
+    day are considered, matching the all_day feed window.
+
+    Parameters:
+        table_id (str): Full table path in BigQuery (e.g., dataset.table_name).
+        project_id (str): Google Cloud project ID.
+
+    Returns:
+        set: Event IDs already present in the table (empty on any error,
+             e.g. when the table does not exist yet).
+    """
+    try:
+        credentials = _get_credentials()
+        client = bigquery.Client(project=project_id, credentials=credentials)
+        query = (
+            f"SELECT id FROM `{project_id}.{table_id}` "
+            "WHERE DATE(fetched_at) >= DATE_SUB(CURRENT_DATE(), INTERVAL 1 DAY)"
+        )
+        return set(client.query(query).to_dataframe()['id'])
+    except Exception as e:
+        logging.warning(f"Could not fetch existing ids from {table_id}: {e}")
+        return set()
+
+def _append_via_storage_write_api(df: pd.DataFrame, table_id: str, project_id: str, credentials):
+    """
+    Append a DataFrame through the BigQuery Storage Write API default stream.
+
+    The frame is serialized as Arrow record batches and streamed with
+    append_rows, which ingests at much higher throughput and lower
+    latency than load jobs or legacy insertAll for the recurring
+    append-mode pipeline.
+
+    Parameters:
+        df (pd.DataFrame): Rows to append.
+        table_id (str): Table path as dataset.table_name.
+        project_id (str): Google Cloud project ID.
+        credentials: Service account credentials.
+
+    Returns:
+        None
+    """
+    write_client = bigquery_storage_v1.BigQueryWriteClient(credentials=credentials)
+    dataset_id, table_name = table_id.split('.')
+    stream_name = f"{write_client.table_path(project_id, dataset_id, table_name)}/_default"
+
+    # The Write API does not take dictionary-encoded arrow columns, so
+    # decode the category columns back to strings for this path
+    category_columns = df.select_dtypes(include='category').columns
+    if len(category_columns):
+        df = df.astype({column: 'string' for column in category_columns})
+
+    # The Write API expects microsecond-precision TIMESTAMPs; unlike the
+    # parquet load job path it does not coerce ns->us server-side, so
+    # cast the datetime columns down before serializing
+    datetime_columns = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    if len(datetime_columns):
+        df = df.astype({
+            column: str(df[column].dtype).replace('[ns', '[us')
+            for column in datetime_columns
+        })
+
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    writer_schema = storage_types.ArrowSchema(
+        serialized_schema=arrow_table.schema.serialize().to_pybytes()
+    )
+
+    requests = [
+        storage_types.AppendRowsRequest(
+            write_stream=stream_name,
+            arrow_rows=storage_types.AppendRowsRequest.ArrowData(
+                writer_schema=writer_schema,
+                rows=storage_types.ArrowRecordBatch(
+                    serialized_record_batch=batch.serialize().to_pybytes()
+                ),
+            ),
+        )
+        for batch in arrow_table.to_batches()
+    ]
+
+    # Per-request failures come back in-band on each response rather than
+    # raising from the stream, so check every one and fail loudly
+    for response in write_client.append_rows(iter(requests)):
+        if response.error.code:
+            row_errors = "; ".join(
+                f"row {error.index}: {error.message}" for error in response.row_errors
+            )
+            message = f"Storage Write API append failed: {response.error.message}"
+            if row_errors:
+                message += f" (row errors: {row_errors})"
+            raise RuntimeError(message)
+
 def upload_to_bigquery(
     df: pd.DataFrame,
     table_id: str,
@@ -33,6 +158,11 @@ def upload_to_bigquery(
     """
     Upload a pandas DataFrame to Google BigQuery using service account credentials.
 
+    The frame is shipped as a parquet load job
+    (Client.load_table_from_dataframe): pyarrow serializes the columns
+    with their exact dtypes, so categorical columns go over the wire
+    dictionary-encoded and BigQuery skips type autodetection.
+
     Parameters:
         df (pd.DataFrame): Cleaned and enriched data to upload.
         table_id (str): Full table path in BigQuery (e.g., dataset.table_name).
@@ -45,20 +175,23 @@ def upload_to_bigquery(
         None
     """
     try:
-        credentials = GcpCredentials.load("gcp-credentials").get_credentials_from_service_account()
+        credentials = _get_credentials()
         # logging.info(f"Authenticating using service account at: {credentials_path}")
         # credentials = service_account.Credentials.from_service_account_file(
         #     credentials_path
         # )
 
         logging.info(f"Uploading to BigQuery table: {table_id} (mode: {if_exists})")
-        to_gbq(
-            dataframe=df,
-            destination_table=table_id,
-            project_id=project_id,
-            if_exists=if_exists,
-            credentials=credentials
-        )
+        if if_exists == "append":
+            # Recurring real-time appends go through the Storage Write API
+            _append_via_storage_write_api(df, table_id, project_id, credentials)
+        else:
+            client = bigquery.Client(project=project_id, credentials=credentials)
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=WRITE_DISPOSITIONS[if_exists],
+            )
+            client.load_table_from_dataframe(df, table_id, job_config=job_config).result()
         logging.info("Upload completed successfully.")
     except Exception as e:
-        logging.error(f"Failed to upload to BigQuery: {e}")
\ No newline at end of file
+        logging.error(f"Failed to upload to BigQuery: {e}")
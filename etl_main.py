@@ -5,10 +5,11 @@ from datetime import datetime
 
 from etl.extract import fetch_earthquake_all_day
 from etl.transform import clean_earthquake_data, enrich_earthquake_data
-from etl.load import upload_to_bigquery
+from etl.load import fetch_existing_ids, upload_to_bigquery
 
 from prefect_gcp import GcpCredentials
-from prefect import flow
+from prefect import flow, task
+from prefect.task_runners import ConcurrentTaskRunner
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -26,35 +27,65 @@ logging.basicConfig(
     ]
 )
 
-@flow(name="ETL Pipeline", log_prints=True)
+# === Prefect Tasks ===
+extract_task = task(fetch_earthquake_all_day, name="extract", retries=2, retry_delay_seconds=10)
+clean_task = task(clean_earthquake_data, name="clean")
+enrich_task = task(enrich_earthquake_data, name="enrich")
+upload_task = task(upload_to_bigquery, name="upload")
+existing_ids_task = task(fetch_existing_ids, name="existing-ids")
+
+@flow(name="ETL Pipeline", log_prints=True, task_runner=ConcurrentTaskRunner())
 def run_pipeline(mode:str='replace') -> None:
     """
     run the ETL pipeline with configurable mode.
 
+    Stages run as Prefect tasks on a ConcurrentTaskRunner: the
+    append-mode existing-IDs query overlaps the fetch and cleanup
+    tasks instead of blocking between them, and the scheduler can
+    overlap I/O-bound tasks across runs.
+
     args:
         mode (str,optional): 'replace', 'fail', 'append'. Default is 'replace'.
     """
-    #1. Extract
     logging.info(f"Starting ETL Pipeline - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ")
-    raw = fetch_earthquake_all_day()
-    if raw.empty:
+
+    PROJECT_ID = os.getenv("PROJECT_ID")
+    TABLE_ID = os.getenv("TABLE_ID")
+    # CREDENTIALS_PATH = os.getenv("CREDENTIALS_PATH")
+
+    #1. Extract (the existing-IDs lookup runs concurrently with it)
+    raw_future = extract_task.submit()
+    existing_ids_future = (
+        existing_ids_task.submit(TABLE_ID, PROJECT_ID) if mode == 'append' else None
+    )
+    if raw_future.result().empty:
         logging.error("No data fetched. Exiting Pipeline.")
         return
-    
+
     #2. Transform
     logging.info("Transforming data...")
     logging.info(f"--Data Cleanup")
-    cleaned = clean_earthquake_data(raw)
+    cleaned = clean_task.submit(raw_future).result()
+
+    # In append mode, skip events earlier runs already enriched and
+    # uploaded -- successive all_day windows heavily overlap, and
+    # enrichment (reverse-geocoding) is the slowest stage
+    if existing_ids_future is not None:
+        existing_ids = existing_ids_future.result()
+        if existing_ids:
+            before = len(cleaned)
+            cleaned = cleaned[~cleaned['id'].isin(existing_ids)]
+            logging.info(f"--Incremental mode: {before - len(cleaned)} events already loaded, {len(cleaned)} new")
+        if cleaned.empty:
+            logging.info("No new events to process. Exiting Pipeline.")
+            return
+
     logging.info(f"--Data Enrichment")
-    enriched = enrich_earthquake_data(cleaned)
+    enriched_future = enrich_task.submit(cleaned)
 
     #3. Load
-    PROJECT_ID = os.getenv("PROJECT_ID")
-    TABLE_ID = os.getenv("TABLE_ID")
-    # CREDENTIALS_PATH = os.getenv("CREDENTIALS_PATH")
-
     logging.info("Loading data to BigQuery...")
-    upload_to_bigquery(enriched, TABLE_ID, PROJECT_ID, mode)
+    upload_task.submit(enriched_future, TABLE_ID, PROJECT_ID, mode).wait()
 
     logging.info(f"ETL Pipeline completed - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ")
     return